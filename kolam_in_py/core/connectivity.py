@@ -0,0 +1,220 @@
+from typing import Dict, List, Tuple
+from .tile_data import Tile
+
+_MISSING = object()
+
+
+class LoopConstraint:
+    """Keeps the collapsed strokes of the grid down to one closed line.
+
+    Every socket position a stroke passes through is a node in a union-find.
+    Components track how many of their ends are still waiting for the
+    neighbouring cell, so a collapse that closes a loop early or leaves a
+    strand with nowhere to go is rejected in O(log n). Only the collapse
+    that closes the loop scans the grid, to check the rest can stay blank.
+    Rejected collapses are rolled back through an undo log.
+    """
+
+    def __init__(self, tiles: List[Tile], tile_data):
+        if getattr(tile_data, "strokes", None) is None:
+            raise ValueError(f"{tile_data.__name__} does not declare strokes")
+
+        self.check_strokes(tile_data)
+        self.socket_len = len(tiles[0].edges[0])
+        self.strokes: List[List[Tuple[Tuple[int, int], ...]]] = []
+        self.allowed = 0  # tiles whose strokes are all simple strands
+        self.blank = 0  # tiles that carry no line at all
+
+        for i, tile in enumerate(tiles):
+            strokes = [
+                tuple(((side + tile.rotation) % 4, pos) for side, pos in stroke)
+                for stroke in tile_data.strokes[tile.base_index]
+            ]
+            self.strokes.append(strokes)
+            if all(len(stroke) == 2 for stroke in strokes):
+                self.allowed |= 1 << i
+            if not strokes:
+                self.blank |= 1 << i
+
+        # the top row always borders the canvas, and tile sets are closed
+        # under rotation, so some tile must keep one side free of the line
+        if not any(
+            all(side != 0 for stroke in self.strokes[i] for side, _ in stroke)
+            for i in range(len(tiles))
+            if self.allowed >> i & 1
+        ):
+            raise ValueError(
+                f"{tile_data.__name__} carries the line across every tile edge, "
+                "so it always runs off the canvas"
+            )
+
+        self.reset(1, 1)
+
+    @staticmethod
+    def check_strokes(tile_data):
+        # A neighbour only continues a line if both sides agree on which
+        # sockets carry one, so that has to follow from the socket alone.
+        carries: Dict[str, bool] = {}
+        for edges, strokes in zip(tile_data.base_edges, tile_data.strokes):
+            ends = [end for stroke in strokes for end in stroke]
+            if len(set(ends)) != len(ends):
+                raise ValueError(f"strokes {strokes} reuse a socket position")
+            for side, edge in enumerate(edges):
+                for pos, ch in enumerate(edge):
+                    has_end = (side, pos) in ends
+                    if carries.setdefault(ch, has_end) != has_end:
+                        raise ValueError(
+                            f"strokes {strokes} do not match sockets {edges}"
+                        )
+
+    def reset(self, dim_x, dim_y, x_symmetry=False, y_symmetry=False):
+        self.dim_x = dim_x
+        self.dim_y = dim_y
+        self.x_symmetry = x_symmetry
+        self.y_symmetry = y_symmetry
+        # a mirrored half only closes into one loop if it reaches every axis
+        self.required_axes = x_symmetry | y_symmetry << 1
+
+        self.parent: Dict[int, int] = {}
+        self.size: Dict[int, int] = {}
+        self.open: Dict[int, int] = {}  # root -> ends not yet matched
+        self.axes: Dict[int, int] = {}  # root -> mirror axes touched
+        self.open_components = 0
+        self.loops = 0
+        self.remaining = dim_x * dim_y
+        self._mirror_ends = 0
+        self._log: List[Tuple[dict, int, object]] = []
+
+    def _set(self, table, key, value):
+        self._log.append((table, key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def _set_open(self, root, value):
+        old = self.open.get(root, 0)
+        if (old > 0) != (value > 0):
+            self.open_components += 1 if value > 0 else -1
+        self._set(self.open, root, value)
+
+    def _undo(self, counters):
+        while self._log:
+            table, key, old = self._log.pop()
+            if old is _MISSING:
+                del table[key]
+            else:
+                table[key] = old
+        self.open_components, self.loops, self.remaining = counters
+
+    def find(self, node):
+        while self.parent[node] != node:
+            node = self.parent[node]
+        return node
+
+    def slot(self, idx, side, pos):
+        """Node id shared by both cells touching a socket position.
+
+        Returns "x"/"y" for a mirror axis and None on the outer border,
+        where a strand could never be continued.
+        """
+        i, j = idx % self.dim_x, idx // self.dim_x
+        flip = self.socket_len - 1 - pos
+
+        if side == 0 and j > 0:
+            return ((idx - self.dim_x) * 4 + 2) * self.socket_len + flip
+        if side == 3 and i > 0:
+            return ((idx - 1) * 4 + 1) * self.socket_len + flip
+        if (side == 1 and i < self.dim_x - 1) or (side == 2 and j < self.dim_y - 1):
+            return (idx * 4 + side) * self.socket_len + pos
+
+        if side == 1 and self.x_symmetry:
+            return "x"
+        if side == 2 and self.y_symmetry:
+            return "y"
+        return None
+
+    def add_end(self, node):
+        if node == "x" or node == "y":
+            # mirror end: its twin is the reflected stroke, so it is matched
+            axis = 1 if node == "x" else 2
+            self._mirror_ends -= 1
+            node = self._mirror_ends
+            self._set(self.parent, node, node)
+            self._set(self.size, node, 1)
+            self._set(self.axes, node, axis)
+            self._set_open(node, 0)
+            return node
+
+        if node in self.parent:  # the neighbour already reached this socket
+            root = self.find(node)
+            self._set_open(root, self.open[root] - 1)
+        else:
+            self._set(self.parent, node, node)
+            self._set(self.size, node, 1)
+            self._set(self.axes, node, 0)
+            self._set_open(node, 1)
+        return node
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+
+        self._set(self.parent, rb, ra)
+        self._set(self.size, ra, self.size[ra] + self.size[rb])
+        self._set(self.axes, ra, self.axes[ra] | self.axes[rb])
+        total = self.open[ra] + self.open[rb]
+        self._set_open(rb, 0)
+        self._set_open(ra, total)
+        return ra
+
+    def try_collapse(self, grid, idx, tile) -> bool:
+        """Commit `tile` at `idx` if the line can still become one loop."""
+        counters = (self.open_components, self.loops, self.remaining)
+        self._log = []
+
+        for stroke in self.strokes[tile]:
+            nodes = []
+            for side, pos in stroke:
+                node = self.slot(idx, side, pos)
+                if node is None:  # strand runs off the canvas
+                    self._undo(counters)
+                    return False
+                nodes.append(self.add_end(node))
+
+            root = nodes[0]
+            for node in nodes[1:]:
+                root = self.union(root, node)
+
+            if self.open[self.find(root)] == 0:
+                if self.axes[self.find(root)] != self.required_axes:
+                    self._undo(counters)
+                    return False
+                self.loops += 1
+
+        self.remaining -= 1
+        closed_now = self.loops > counters[1]
+        if (
+            self.loops > 1
+            or (self.loops and self.open_components)
+            or (self.remaining == 0 and self.loops != 1)
+            or (closed_now and not self.rest_can_be_blank(grid, idx))
+        ):
+            self._undo(counters)
+            return False
+
+        self._log = []
+        return True
+
+    def rest_can_be_blank(self, grid, idx):
+        # only runs on the collapse that closes the loop
+        if self.remaining == 0:
+            return True
+        if not self.blank:
+            return False
+        for k, cell in enumerate(grid):
+            if k == idx or cell.collapsed:
+                continue
+            if not any(self.blank >> opt & 1 for opt in cell.options):
+                return False
+        return True
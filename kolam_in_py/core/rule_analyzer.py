@@ -0,0 +1,231 @@
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from .tile_data import Tile
+
+
+class UnsatisfiableError(Exception):
+    """Raised when a tile set can never fill a grid of the requested size."""
+
+
+class RuleAnalyzer:
+    """Compiles the adjacency rules of a tile set once, before any solving.
+
+    Domains are kept as int bitmasks (bit i set -> tile i allowed) so the
+    arc-consistency passes stay cheap even on large grids.
+    """
+
+    def __init__(self, tiles: List[Tile], tile_data):
+        self.tiles = tiles
+        self.name = tile_data.__name__
+        self.edge_socket = tile_data.edge_constraint
+        self.forbidden = self.resolve_forbidden_pairs(
+            getattr(tile_data, "forbidden_pairs", [])
+        )
+
+        for tile in tiles:
+            tile.analyze(tiles, self.forbidden)
+
+        # supports[d][t] -> mask of tiles allowed next to tile t in direction d
+        self.supports = [
+            [self.to_mask(tile.up) for tile in tiles],
+            [self.to_mask(tile.right) for tile in tiles],
+            [self.to_mask(tile.down) for tile in tiles],
+            [self.to_mask(tile.left) for tile in tiles],
+        ]
+        # boundary[d] -> mask of tiles whose side d may touch the grid border
+        self.boundary = [
+            self.to_mask(
+                i
+                for i, tile in enumerate(tiles)
+                if self.edge_socket is None or tile.edges[d] == self.edge_socket
+            )
+            for d in range(4)
+        ]
+
+        self._support_cache: Dict[Tuple[int, int], int] = {}
+        self._usable_cache: Dict[Tuple[bool, bool, Optional[int]], int] = {}
+        self._domain_cache: Dict[tuple, Optional[List[int]]] = {}
+
+    @staticmethod
+    def to_mask(indices) -> int:
+        mask = 0
+        for i in indices:
+            mask |= 1 << i
+        return mask
+
+    @staticmethod
+    def to_list(mask: int) -> List[int]:
+        options = []
+        i = 0
+        while mask:
+            if mask & 1:
+                options.append(i)
+            mask >>= 1
+            i += 1
+        return options
+
+    def resolve_forbidden_pairs(self, pairs) -> Set[Tuple[int, int]]:
+        # Pairs are declared as (base index, rotation) so they survive the
+        # rotation/dedupe step that renumbers tiles.
+        lookup = {(t.base_index, t.rotation): i for i, t in enumerate(self.tiles)}
+        forbidden = set()
+        for a, b in pairs:
+            if a not in lookup or b not in lookup:
+                raise ValueError(f"{self.name}: unknown forbidden pair {a}, {b}")
+            forbidden.add((lookup[a], lookup[b]))
+            forbidden.add((lookup[b], lookup[a]))
+
+        return forbidden
+
+    def support(self, direction: int, mask: int) -> int:
+        """Union of tiles allowed in `direction` of any tile in `mask`."""
+        key = (direction, mask)
+        cached = self._support_cache.get(key)
+        if cached is not None:
+            return cached
+
+        allowed = 0
+        table = self.supports[direction]
+        i = 0
+        m = mask
+        while m:
+            if m & 1:
+                allowed |= table[i]
+            m >>= 1
+            i += 1
+
+        self._support_cache[key] = allowed
+        return allowed
+
+    def usable_tiles(self, x_symmetry=False, y_symmetry=False, allowed=None) -> int:
+        """Mask of tiles that can appear somewhere in a grid of any size.
+
+        A tile is dropped when one of its sides matches no remaining tile and
+        may not touch the border either, repeated until nothing changes.
+        Mirrored sides (right/down under symmetry) may hold any socket.
+        `allowed` optionally restricts the starting set of tiles.
+        """
+        key = (x_symmetry, y_symmetry, allowed)
+        if key in self._usable_cache:
+            return self._usable_cache[key]
+
+        open_sides = list(self.boundary)
+        if x_symmetry:
+            open_sides[1] = (1 << len(self.tiles)) - 1
+        if y_symmetry:
+            open_sides[2] = (1 << len(self.tiles)) - 1
+
+        usable = (1 << len(self.tiles)) - 1
+        if allowed is not None:
+            usable &= allowed
+        changed = True
+        while changed:
+            changed = False
+            for i in self.to_list(usable):
+                for d in range(4):
+                    if self.supports[d][i] & usable or open_sides[d] >> i & 1:
+                        continue
+                    usable &= ~(1 << i)
+                    changed = True
+                    break
+
+        self._usable_cache[key] = usable
+        return usable
+
+    def initial_masks(
+        self, dim_x, dim_y, x_symmetry=False, y_symmetry=False, allowed=None
+    ) -> List[int]:
+        """Arc-consistent starting masks for every cell (row major).
+
+        Raises UnsatisfiableError when some cell is left without options,
+        so a bad configuration fails at once instead of restarting forever.
+        The returned list is cached and shared, so never mutate it.
+        """
+        key = (dim_x, dim_y, x_symmetry, y_symmetry, allowed)
+        if key not in self._domain_cache:
+            self._domain_cache[key] = self.arc_consistency(*key)
+
+        domains = self._domain_cache[key]
+        if domains is None:
+            raise UnsatisfiableError(
+                f"{self.name} cannot fill a {dim_x}x{dim_y} grid "
+                f"with edge socket {self.edge_socket!r}"
+            )
+
+        return domains
+
+    def initial_domains(
+        self, dim_x, dim_y, x_symmetry=False, y_symmetry=False, allowed=None
+    ):
+        masks = self.initial_masks(dim_x, dim_y, x_symmetry, y_symmetry, allowed)
+        return [self.to_list(mask) for mask in masks]
+
+    def arc_consistency(self, dim_x, dim_y, x_symmetry, y_symmetry, allowed):
+        usable = self.usable_tiles(x_symmetry, y_symmetry, allowed)
+        domains = {}
+        for j in range(dim_y):
+            for i in range(dim_x):
+                mask = usable
+                if j == 0:
+                    mask &= self.boundary[0]
+                if j == dim_y - 1 and not y_symmetry:
+                    mask &= self.boundary[2]
+                if i == 0:
+                    mask &= self.boundary[3]
+                if i == dim_x - 1 and not x_symmetry:
+                    mask &= self.boundary[1]
+                if not mask:
+                    return None
+                domains[i + j * dim_x] = mask
+
+        if not self.propagate(domains, dim_x, dim_y, range(dim_x * dim_y)):
+            return None
+
+        return [domains[idx] for idx in range(dim_x * dim_y)]
+
+    @staticmethod
+    def neighbors(idx, dim_x, dim_y):
+        """(neighbor, direction) pairs; direction is the neighbor's side facing idx."""
+        i, j = idx % dim_x, idx // dim_x
+        neighbors = []
+        if j > 0:
+            neighbors.append((idx - dim_x, 2))  # up neighbor allows its down
+        if i < dim_x - 1:
+            neighbors.append((idx + 1, 3))
+        if j < dim_y - 1:
+            neighbors.append((idx + dim_x, 0))
+        if i > 0:
+            neighbors.append((idx - 1, 1))
+        return neighbors
+
+    def propagate(self, domains, dim_x, dim_y, seeds, fixed=None) -> bool:
+        """Narrow `domains` (idx -> mask) until its cells are arc consistent.
+
+        Only cells present in `domains` are touched; any other neighbor is
+        read through `fixed(idx)`, so the work stays proportional to the
+        cells handed in. Returns False if a cell runs out of options.
+        """
+        queue = deque(idx for idx in seeds if idx in domains)
+        queued = set(queue)
+        while queue:
+            idx = queue.popleft()
+            queued.discard(idx)
+            neighbors = self.neighbors(idx, dim_x, dim_y)
+
+            mask = domains[idx]
+            for n, direction in neighbors:
+                other = domains[n] if n in domains else fixed(n)
+                mask &= self.support(direction, other)
+
+            if mask == domains[idx]:
+                continue
+            if not mask:
+                return False
+
+            domains[idx] = mask
+            for n, _ in neighbors:
+                if n in domains and n not in queued:
+                    queued.add(n)
+                    queue.append(n)
+
+        return True
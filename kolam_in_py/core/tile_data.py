@@ -10,13 +10,15 @@ class Tile:
         self.down = []
         self.left = []
         self.index = index
+        self.base_index = index  # index of the base tile this was rotated from
+        self.rotation = 0
 
     def compare_edge(self, tile1, tile2):
         return tile1 == tile2[::-1]
 
-    def analyze(self, tiles):
+    def analyze(self, tiles, forbidden=()):
         for i, tile in enumerate(tiles):
-            if tile.index == 5 and self.index == 5:
+            if (self.index, i) in forbidden:
                 continue
 
             if self.compare_edge(tile.edges[2], self.edges[0]):
@@ -36,7 +38,10 @@ class Tile:
         new_img = pygame.transform.rotate(self.img, angle)
         len_e = len(self.edges)
         new_edges = [self.edges[(i - num) % len_e] for i in range(len_e)]
-        return Tile(new_img, new_edges, self.index)
+        tile = Tile(new_img, new_edges, self.index)
+        tile.base_index = self.base_index
+        tile.rotation = (self.rotation + num) % len_e
+        return tile
 
 
 class Cell:
@@ -68,6 +73,7 @@ class Circuit:
     img_count = 13
     path = os.path.join("assets", "tiles", "Circuit")
     edge_constraint = None
+    forbidden_pairs = [((2, 3), (2, 3))]  # (base index, rotation) never adjacent
 
 
 class KolamTiles0:
@@ -83,7 +89,21 @@ class KolamTiles0:
     img_count = 6
     path = os.path.join("assets", "tiles", "KolamTiles0")
     edge_constraint = None  # For now
-
+    forbidden_pairs = [((2, 0), (2, 0))]
+    strokes = [
+        [  # Line strands per img as (side, socket position) endpoints
+            ((0, 0), (3, 1)),  # corner arcs join into circles around the dots
+            ((0, 1), (1, 0)),
+            ((1, 1), (2, 0)),
+            ((2, 1), (3, 0)),
+            (),  # closed ring around the centre dot
+        ],
+        [((0, 0), (3, 1)), ((0, 1), (1, 0)), ((1, 1), (2, 0)), ((2, 1), (3, 0))],
+        [((0, 0), (2, 1)), ((3, 1), (3, 0)), ((0, 1), (1, 0)), ((1, 1), (2, 0))],
+        [((0, 0), (2, 1)), ((3, 1), (2, 0)), ((3, 0), (1, 1)), ((0, 1), (1, 0))],
+        [((0, 0), (2, 1)), ((0, 1), (2, 0)), ((3, 1), (1, 0)), ((3, 0), (1, 1))],
+        [((0, 0), (1, 1)), ((3, 1), (2, 0)), ((0, 1), (1, 0)), ((2, 1), (3, 0))],
+    ]
 
 class KolamTiles1:
     base_edges = [
@@ -97,3 +117,11 @@ class KolamTiles1:
     img_count = 5
     path = os.path.join("assets", "tiles", "KolamTiles1")
     edge_constraint = "000"
+    forbidden_pairs = [((1, 1), (1, 1))]
+    strokes = [
+        [((1, 1), (2, 1))],
+        [((0, 1), (1, 1), (2, 1))],
+        [((0, 1), (2, 1)), ((1, 1), (3, 1))],
+        [((1, 1),)],
+        [((0, 1), (2, 1))],
+    ]
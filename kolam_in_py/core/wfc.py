@@ -1,7 +1,9 @@
-import random
+import copy, random
 from config import gVar
 from .tile_data import *
-from typing import List, Optional, cast
+from .rule_analyzer import RuleAnalyzer, UnsatisfiableError
+from .connectivity import LoopConstraint
+from typing import Dict, List, Optional, Set, Tuple, cast
 from utils.colors import Colors
 
 
@@ -19,6 +21,14 @@ class WFCGenerator:
         self.y_symmetry = False
         self.dim_x = gVar.DIM
         self.dim_y = gVar.DIM
+        self.solvable = True
+        self.loop: Optional[LoopConstraint] = None  # single-loop (kambi) mode
+        self.pins: Dict[Tuple[int, int], int] = {}  # (i, j) -> tile index
+        self.skipped_pins: Set[Tuple[int, int]] = set()  # not placed this run
+        self.restarts = 0
+        self.edit: Optional[tuple] = None  # single-loop edit still being solved
+        self.last_tried: Dict[Tuple[int, int], int] = {}  # pin_next cursor
+        self.listeners = []  # get on_restart(gen) / on_collapse(gen, idx) calls
         self.setup_tiles()
         self.start_over()
 
@@ -37,51 +47,294 @@ class WFCGenerator:
             if options[i] not in valid_set:
                 options.pop(i)
 
-    def edge_filling(self):
-        edge_socket = gVar.TILE_DATA.edge_constraint
+    def set_single_loop(self, enabled):
+        if not enabled:
+            self.loop = None
+            return
 
-        valid_up_indices = {
-            i for i, tile in enumerate(self.tiles) if tile.edges[0] == edge_socket
-        }
-        valid_right_indices = {
-            i for i, tile in enumerate(self.tiles) if tile.edges[1] == edge_socket
-        }
-        valid_down_indices = {
-            i for i, tile in enumerate(self.tiles) if tile.edges[2] == edge_socket
-        }
-        valid_left_indices = {
-            i for i, tile in enumerate(self.tiles) if tile.edges[3] == edge_socket
+        try:
+            self.loop = LoopConstraint(self.tiles, gVar.TILE_DATA)
+        except ValueError as e:
+            print(f"[WFC] single loop unavailable: {e}")
+            self.loop = None
+
+    def start_over(self):
+        self.restarts += 1
+        if self.loop is not None:
+            self.loop.reset(self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry)
+
+        try:
+            domains = self.rules.initial_domains(
+                self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry, self.allowed()
+            )
+        except UnsatisfiableError as e:
+            print(f"[WFC] {e}")
+            self.solvable = False
+            self.grid = [Cell([]) for _ in range(self.dim_x * self.dim_y)]
+            return
+
+        self.solvable = True
+        self.grid = [Cell(options) for options in domains]
+        for listener in self.listeners:
+            listener.on_restart(self)
+
+        if self.pins:
+            self.apply_pins()
+        else:
+            self.skipped_pins = set()
+
+    def apply_pins(self):
+        # Pins are added oldest first; one that does not fit this grid is
+        # skipped but kept, so it comes back when the configuration allows.
+        masks = self.rules.initial_masks(
+            self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry, self.allowed()
+        )
+        domains = dict(enumerate(masks))
+        skipped: Dict[Tuple[int, int], str] = {}
+        placed = []
+
+        for (i, j), tile in self.pins.items():
+            if i >= self.dim_x or j >= self.dim_y:
+                continue  # kept back for when the grid grows again
+
+            idx = i + j * self.dim_x
+            if not masks[idx] >> tile & 1:
+                skipped[(i, j)] = "does not fit this grid"
+                continue
+
+            trial = dict(domains)
+            trial[idx] = 1 << tile
+            seeds = [n for n, _ in self.rules.neighbors(idx, self.dim_x, self.dim_y)]
+            if not self.rules.propagate(trial, self.dim_x, self.dim_y, seeds):
+                skipped[(i, j)] = f"conflicts with the pins at {placed}"
+                continue
+            if self.loop is not None and not self.loop.try_collapse(
+                self.grid, idx, tile
+            ):
+                skipped[(i, j)] = "breaks the single loop"
+                continue
+
+            domains = trial
+            placed.append((i, j))
+
+        for pos, reason in skipped.items():
+            if pos not in self.skipped_pins:  # restarts would repeat it
+                print(f"[WFC] pin at {pos} {reason} - skipped")
+        self.skipped_pins = set(skipped)
+
+        for idx, mask in domains.items():
+            self.grid[idx].options = self.rules.to_list(mask)
+        for i, j in placed:
+            idx = i + j * self.dim_x
+            self.grid[idx].collapsed = True
+            self.notify_collapse(idx)
+
+    def allowed(self):
+        return None if self.loop is None else self.loop.allowed
+
+    def option_mask(self, idx):
+        return self.rules.to_mask(self.grid[idx].options)
+
+    def cell_at(self, x, y):  # screen position -> (i, j), folding mirrored halves
+        i = x // (self.screen_width // self.dim_x)
+        j = y // (self.screen_height // self.dim_y)
+        if self.x_symmetry and i >= self.dim_x:
+            i = 2 * self.dim_x - 1 - i
+        if self.y_symmetry and j >= self.dim_y:
+            j = 2 * self.dim_y - 1 - j
+
+        if 0 <= i < self.dim_x and 0 <= j < self.dim_y:
+            return i, j
+        return None
+
+    def pin(self, i, j, tile):
+        """Fix `tile` at cell (i, j) and repair only the cells it disturbs.
+
+        In single-loop mode the edit is only started here, see edit_loop().
+        """
+        if not self.solvable:
+            return False
+        if self.loop is not None:
+            self.edit_loop({**self.pins, (i, j): tile})
+            return True
+
+        old = self.pins.get((i, j))
+        was_skipped = (i, j) in self.skipped_pins
+        self.pins[(i, j)] = tile
+        self.skipped_pins.discard((i, j))
+        if self.repair([i + j * self.dim_x]):
+            return True
+
+        if old is None:
+            del self.pins[(i, j)]
+        else:
+            self.pins[(i, j)] = old
+        if was_skipped:
+            self.skipped_pins.add((i, j))
+        return False
+
+    def pin_next(self, i, j):  # cycle the cell through the tiles that fit
+        if not self.solvable:
+            return
+
+        idx = i + j * self.dim_x
+        masks = self.rules.initial_masks(
+            self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry, self.allowed()
+        )
+        candidates = self.rules.to_list(masks[idx])
+        cell = self.grid[idx]
+        current = cell.options[0] if cell.collapsed and cell.options else -1
+        start = candidates.index(current) + 1 if current in candidates else 0
+
+        if self.loop is not None:
+            # each try re-solves the whole grid, so one candidate per click
+            tried = self.last_tried.get((i, j), current)
+            start = candidates.index(tried) + 1 if tried in candidates else 0
+            tile = candidates[start % len(candidates)]
+            self.last_tried[(i, j)] = tile
+            self.pin(i, j, tile)
+            return
+
+        for k in range(len(candidates)):
+            tile = candidates[(start + k) % len(candidates)]
+            if tile != current and self.pin(i, j, tile):
+                return
+
+        print(f"[WFC] no other tile fits at {(i, j)}")
+
+    def erase(self, i, j, radius=1):
+        """Unpin and regenerate the square of cells around (i, j)."""
+        if not self.solvable:
+            return
+
+        cells = []
+        pins = dict(self.pins)
+        for y in range(max(0, j - radius), min(self.dim_y, j + radius + 1)):
+            for x in range(max(0, i - radius), min(self.dim_x, i + radius + 1)):
+                pins.pop((x, y), None)
+                cells.append(x + y * self.dim_x)
+
+        if self.loop is not None:
+            self.edit_loop(pins)
+            return
+
+        self.pins = pins
+        if not self.repair(cells):
+            print(f"[WFC] could not regenerate around {(i, j)}")
+
+    def repair(self, cells, max_growth=4):
+        """Re-solve `cells`, widening by one ring on each contradiction."""
+        masks = self.rules.initial_masks(
+            self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry
+        )
+        region = set(cells)
+        for _ in range(max_growth + 1):
+            if self.solve_region(region, masks):
+                return True
+            region |= {
+                n
+                for idx in region
+                for n, _ in self.rules.neighbors(idx, self.dim_x, self.dim_y)
+            }
+
+        return False
+
+    def layout(self):
+        return (self.dim_x, self.dim_y, self.x_symmetry, self.y_symmetry, self.loop)
+
+    def edit_loop(self, pins, max_restarts=50):
+        """Restart the design around `pins`; step() then finishes or undoes it.
+
+        The loop constraint is global, so an edit re-solves the whole grid.
+        It runs at the normal step() pace, and the design from before the
+        edit is kept to roll back to; edits made while one is still being
+        solved are kept or undone together.
+        """
+        if self.edit is None:
+            self.edit = (
+                self.grid,
+                copy.deepcopy(self.loop),
+                dict(self.pins),
+                set(self.skipped_pins),
+                self.restarts + max_restarts,
+                self.layout(),
+            )
+        self.pins = pins
+        print("[WFC] single loop: edit restarts the whole design")
+        self.start_over()
+
+    def check_edit(self):
+        grid, loop, pins, skipped, restart_limit, layout = self.edit
+        if layout != self.layout():
+            self.edit = None  # the grid was reconfigured, nothing to go back to
+            return
+        if self.solvable and all(c.collapsed for c in self.grid):
+            self.edit = None
+            return
+        if (
+            self.solvable
+            and not self.skipped_pins - skipped
+            and self.restarts <= restart_limit
+        ):
+            return
+
+        print("[WFC] single loop: edit does not fit the loop - undone")
+        self.edit = None
+        self.grid, self.loop, self.pins, self.skipped_pins = grid, loop, pins, skipped
+        self.solvable = True
+        for listener in self.listeners:
+            listener.on_restart(self)
+        for idx, cell in enumerate(self.grid):
+            if cell.collapsed:
+                self.notify_collapse(idx)
+
+    def solve_region(self, region, masks):
+        # Cells outside the region are read, never written, except for
+        # undecided cells on its rim, which are re-filtered against it.
+        dim_x, dim_y = self.dim_x, self.dim_y
+        domains = {}
+        for idx in region:
+            pos = (idx % dim_x, idx // dim_x)
+            pin = None if pos in self.skipped_pins else self.pins.get(pos)
+            domains[idx] = masks[idx] if pin is None else masks[idx] & (1 << pin)
+            if not domains[idx]:
+                return False
+
+        rim = {
+            n
+            for idx in region
+            for n, _ in self.rules.neighbors(idx, dim_x, dim_y)
+            if n not in region and not self.grid[n].collapsed
         }
+        for n in rim:
+            domains[n] = masks[n]
 
-        for j in range(self.dim_y):
-            for i in range(self.dim_x):
-                is_on_edge = (
-                    i == 0 or i == self.dim_x - 1 or j == 0 or j == self.dim_y - 1
-                )
-                if not is_on_edge:
-                    continue
+        seeds = list(domains)
+        if not self.rules.propagate(domains, dim_x, dim_y, seeds, self.option_mask):
+            return False
 
-                idx = i + j * self.dim_x
-                cell_options = set(self.grid[idx].options)
+        while True:
+            undecided = [idx for idx in region if domains[idx] & (domains[idx] - 1)]
+            if not undecided:
+                break
 
-                if j == 0:
-                    cell_options.intersection_update(valid_up_indices)
-                if j == self.dim_y - 1 and not self.y_symmetry:
-                    cell_options.intersection_update(valid_down_indices)
-                if i == 0:
-                    cell_options.intersection_update(valid_left_indices)
-                if i == self.dim_x - 1 and not self.x_symmetry:
-                    cell_options.intersection_update(valid_right_indices)
+            entropy = {idx: bin(domains[idx]).count("1") for idx in undecided}
+            min_len = min(entropy.values())
+            idx = random.choice([k for k in undecided if entropy[k] == min_len])
+            domains[idx] = 1 << random.choice(self.rules.to_list(domains[idx]))
 
-                self.grid[idx].options = list(cell_options)
+            seeds = [n for n, _ in self.rules.neighbors(idx, dim_x, dim_y)]
+            if not self.rules.propagate(domains, dim_x, dim_y, seeds, self.option_mask):
+                return False
 
-    def start_over(self):
-        self.grid = []
-        for _ in range(self.dim_x * self.dim_y):
-            self.grid.append(Cell(len(self.tiles)))
+        for idx in region:
+            self.grid[idx] = Cell(self.rules.to_list(domains[idx]))
+            self.grid[idx].collapsed = True
+            self.notify_collapse(idx)
+        for n in rim:
+            self.grid[n] = Cell(self.rules.to_list(domains[n]))
 
-        if gVar.TILE_DATA.edge_constraint is not None:
-            self.edge_filling()
+        return True
 
     def setup_tiles(self):
         base_edges = gVar.TILE_DATA.base_edges  # Socket rules
@@ -111,29 +364,43 @@ class WFCGenerator:
             tile.index = i
 
         # Analyze adjacency rules
-        for tile in tiles:
-            tile.analyze(tiles)
-
         self.tiles = tiles
+        self.rules = RuleAnalyzer(tiles, gVar.TILE_DATA)
         print(f"Tiles after rotation/dedupe: {len(self.tiles)}")
 
+        pruned = len(tiles) - bin(self.rules.usable_tiles()).count("1")
+        if pruned:
+            print(f"Tiles unreachable under edge constraint: {pruned}")
+
     def collapse_one(self):  # pick a non-collapsed cell with lowest entropy
-        non_collapsed = [c for c in self.grid if not c.collapsed]
+        non_collapsed = [i for i, c in enumerate(self.grid) if not c.collapsed]
         if not non_collapsed:
             return
 
-        non_collapsed.sort(key=lambda c: len(c.options))
-        min_len = len(non_collapsed[0].options)
-        tie_group = [c for c in non_collapsed if len(c.options) == min_len]
-        chosen = random.choice(tie_group)
+        non_collapsed.sort(key=lambda i: len(self.grid[i].options))
+        min_len = len(self.grid[non_collapsed[0]].options)
+        tie_group = [i for i in non_collapsed if len(self.grid[i].options) == min_len]
+        idx = random.choice(tie_group)
+        chosen = self.grid[idx]
         chosen.collapsed = True
 
-        if not chosen.options:  # contradiction -> restart
+        options = list(chosen.options)
+        random.shuffle(options)
+        if self.loop is not None:
+            # drop picks that would break the single closed line
+            while options and not self.loop.try_collapse(self.grid, idx, options[0]):
+                options.pop(0)
+
+        if not options:  # contradiction -> restart
             self.start_over()
             return
 
-        pick = random.choice(chosen.options)
-        chosen.options = [pick]
+        chosen.options = [options[0]]
+        self.notify_collapse(idx)
+
+    def notify_collapse(self, idx):
+        for listener in self.listeners:
+            listener.on_collapse(self, idx)
 
     def update_neighbors(self):
         next_grid: List[Optional[Cell]] = [None] * (self.dim_x * self.dim_y)
@@ -190,7 +457,9 @@ class WFCGenerator:
         self.grid = cast(List[Cell], next_grid)
 
     def step(self):
-        if all(c.collapsed for c in self.grid):
+        if self.edit is not None:
+            self.check_edit()
+        if not self.solvable or all(c.collapsed for c in self.grid):
             return
 
         self.collapse_one()
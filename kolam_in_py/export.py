@@ -0,0 +1,68 @@
+import os, sys, argparse, random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # no window needed
+
+import pygame
+from config import gVar
+from core.tile_data import *
+from core.wfc import WFCGenerator
+from main import load_tile_images
+from utils.animation import AnimationExporter, GifWriter, PngSequenceWriter
+
+
+def parse_args():
+    names = [tile_set.__name__ for tile_set in gVar.TILE_SET]
+    parser = argparse.ArgumentParser(description="Record a Kolam being generated")
+    parser.add_argument("out", help="output .gif file, or a directory for PNG frames")
+    parser.add_argument("--tiles", choices=names, default=gVar.TILE_DATA.__name__)
+    parser.add_argument("--dim", type=int, default=gVar.DIM)
+    parser.add_argument("--collapses-per-frame", type=int, default=1)
+    parser.add_argument("--fps", type=int, default=gVar.FPS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--single-loop", action="store_true")
+    parser.add_argument("--x-symmetry", action="store_true")
+    parser.add_argument("--y-symmetry", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))  # convert_alpha() needs a display mode
+
+    gVar.TILE_DATA = next(t for t in gVar.TILE_SET if t.__name__ == args.tiles)
+    tile_images = load_tile_images(
+        gVar.TILE_DATA.path, gVar.TILE_DATA.img_count, tile_size=64
+    )
+    kolam = WFCGenerator(None, tile_images)
+    kolam.x_symmetry = args.x_symmetry
+    kolam.y_symmetry = args.y_symmetry
+    kolam.make_symmetry()
+    kolam.dim_x = args.dim // 2 if args.x_symmetry else args.dim
+    kolam.dim_y = args.dim // 2 if args.y_symmetry else args.dim
+    kolam.adjust_screen_size()
+    kolam.set_single_loop(args.single_loop)
+    if args.single_loop and kolam.loop is None:
+        pygame.quit()
+        return 2
+    kolam.start_over()
+
+    if args.out.lower().endswith(".gif"):
+        writer = GifWriter(args.out, (kolam.width, kolam.height), args.fps)
+    else:
+        writer = PngSequenceWriter(args.out)
+    exporter = AnimationExporter(kolam, writer, args.collapses_per_frame)
+
+    while kolam.solvable and not all(c.collapsed for c in kolam.grid):
+        kolam.step()
+
+    exporter.close()
+    pygame.quit()
+    print(f"Wrote {exporter.frames} frames to {args.out}")
+    return 0 if kolam.solvable else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -122,6 +122,7 @@ def main():
 
     running = True
     paused = False
+    single_loop = False  # (l) keep the design as one closed line
 
     # we will run step() once per N frames to slow things a bit (so you can watch it)
     # but we also allow a faster mode by pressing SPACE to run fast.
@@ -147,6 +148,19 @@ def main():
                     pause_btn.trigger_key_action()
                     paused = not paused
 
+                elif event.key == pygame.K_l:
+                    single_loop = not single_loop
+                    kolam.set_single_loop(single_loop)
+                    kolam.start_over()
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] < kolam.height:
+                cell = kolam.cell_at(*event.pos)
+                if cell is not None:
+                    if event.button == 1:  # pin the next tile that fits
+                        kolam.pin_next(*cell)
+                    elif event.button == 3:  # erase and regrow the area
+                        kolam.erase(*cell)
+
             if dim_inc_btn.check_click(event):
                 kolam.dim_x += 1 + kolam.y_symmetry
                 kolam.dim_y += 1 + kolam.x_symmetry
@@ -189,6 +203,7 @@ def main():
 
             elif tile_switch_btn.check_click(event):
                 kolam = change_tileset(screen)
+                kolam.set_single_loop(single_loop)
                 kolam.start_over()
 
             elif symmetric_x_btn.check_click(event):
@@ -0,0 +1,223 @@
+import os, pygame
+from .colors import Colors
+
+# 6x6x6 web-safe palette, so frames can be quantized without a pass over them
+_LEVELS = [0, 51, 102, 153, 204, 255]
+_RED = bytes(36 * round(v / 51) for v in range(256))
+_GREEN = bytes(6 * round(v / 51) for v in range(256))
+_BLUE = bytes(round(v / 51) for v in range(256))
+
+
+def quantize(rgb: bytes) -> bytes:
+    # Each channel maps to its palette offset; the offsets add up to at
+    # most 215, so summing the byte strings as big ints never carries.
+    n = len(rgb) // 3
+    total = (
+        int.from_bytes(rgb[0::3].translate(_RED), "big")
+        + int.from_bytes(rgb[1::3].translate(_GREEN), "big")
+        + int.from_bytes(rgb[2::3].translate(_BLUE), "big")
+    )
+    return total.to_bytes(n, "big")
+
+
+def lzw_encode(indices: bytes, min_code_size=8) -> bytes:
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0
+    nbits = 0
+
+    def emit(code, size):
+        nonlocal bits, nbits
+        bits |= code << nbits
+        nbits += size
+        while nbits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            nbits -= 8
+
+    table = {}
+    next_code = end + 1
+    code_size = min_code_size + 1
+    emit(clear, code_size)
+
+    prefix = indices[0]
+    for byte in indices[1:]:
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        emit(prefix, code_size)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code - 1 == 1 << code_size:
+                code_size += 1
+        else:
+            emit(clear, code_size)
+            table = {}
+            next_code = end + 1
+            code_size = min_code_size + 1
+        prefix = byte
+
+    emit(prefix, code_size)
+    emit(end, code_size)
+    if nbits:
+        out.append(bits & 0xFF)
+    return bytes(out)
+
+
+class GifWriter:
+    """Streams an animated GIF to disk, one (partial) frame at a time."""
+
+    def __init__(self, path, size, fps):
+        self.file = open(path, "wb")
+        self.delay = max(2, round(100 / fps))  # centiseconds; browsers clamp < 2
+        width, height = size
+
+        palette = bytearray()
+        for r in _LEVELS:
+            for g in _LEVELS:
+                for b in _LEVELS:
+                    palette += bytes((r, g, b))
+        palette += bytes(3 * (256 - 216))
+
+        self.file.write(b"GIF89a")
+        self.file.write(width.to_bytes(2, "little") + height.to_bytes(2, "little"))
+        self.file.write(bytes((0xF7, 0, 0)))  # global 256 colour table follows
+        self.file.write(palette)
+        # NETSCAPE2.0 extension: loop forever
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def write(self, surface, rect):
+        sub = surface.subsurface(rect)
+        data = lzw_encode(quantize(pygame.image.tostring(sub, "RGB")))
+
+        # graphic control: keep the previous frame under this one
+        self.file.write(b"\x21\xf9\x04\x04" + self.delay.to_bytes(2, "little"))
+        self.file.write(b"\x00\x00")
+        self.file.write(b"\x2c")
+        for value in (rect.x, rect.y, rect.width, rect.height):
+            self.file.write(value.to_bytes(2, "little"))
+        self.file.write(b"\x00\x08")  # no local palette, LZW min code size 8
+        for i in range(0, len(data), 255):
+            block = data[i : i + 255]
+            self.file.write(bytes((len(block),)) + block)
+        self.file.write(b"\x00")
+
+    def close(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
+class PngSequenceWriter:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        # frames left from a longer earlier run would play on after this one
+        for name in os.listdir(directory):
+            if name.startswith("frame_") and name.endswith(".png"):
+                os.remove(os.path.join(directory, name))
+        self.directory = directory
+        self.count = 0
+
+    def write(self, surface, rect):
+        path = os.path.join(self.directory, f"frame_{self.count:06d}.png")
+        pygame.image.save(surface, path)
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class AnimationExporter:
+    """Records a WFCGenerator as it solves, without a display.
+
+    Collapsed cells are drawn onto one persistent frame buffer, and every
+    `collapses_per_frame` collapses the area that changed is handed to the
+    writer, so memory stays the same however long the run is.
+    """
+
+    def __init__(self, kolam, writer, collapses_per_frame=1):
+        self.writer = writer
+        self.collapses_per_frame = max(1, collapses_per_frame)
+        self.frame = pygame.Surface((kolam.width, kolam.height))
+        self.images = {}  # (tile, flip_x, flip_y) -> scaled image
+        self.dirty = None
+        self.pending = 0
+        self.frames = 0
+
+        kolam.listeners.append(self)
+        self.on_restart(kolam)
+        for idx, cell in enumerate(kolam.grid):
+            if cell.collapsed:
+                self.draw_cell(kolam, idx)
+
+    def cell_rects(self, kolam, idx):
+        # the cell and its mirrored copies, with the flips to apply
+        w = kolam.screen_width // kolam.dim_x
+        h = kolam.screen_height // kolam.dim_y
+        i, j = idx % kolam.dim_x, idx // kolam.dim_x
+
+        xs = [(i * w, False)]
+        if kolam.x_symmetry:
+            xs.append((kolam.width - (i + 1) * w, True))
+        ys = [(j * h, False)]
+        if kolam.y_symmetry:
+            ys.append((kolam.height - (j + 1) * h, True))
+
+        return [
+            (pygame.Rect(x, y, w, h), flip_x, flip_y)
+            for x, flip_x in xs
+            for y, flip_y in ys
+        ]
+
+    def tile_image(self, kolam, tile, size, flip_x, flip_y):
+        key = (tile, flip_x, flip_y)
+        img = self.images.get(key)
+        if img is None or img.get_size() != size:
+            img = pygame.transform.smoothscale(kolam.tiles[tile].img, size)
+            img = pygame.transform.flip(img, flip_x, flip_y)
+            self.images[key] = img
+        return img
+
+    def mark(self, rect):
+        self.dirty = rect.copy() if self.dirty is None else self.dirty.union(rect)
+
+    def draw_cell(self, kolam, idx):
+        tile = kolam.grid[idx].options[0]
+        for rect, flip_x, flip_y in self.cell_rects(kolam, idx):
+            img = self.tile_image(kolam, tile, rect.size, flip_x, flip_y)
+            self.frame.fill(Colors.BLACK, rect)
+            self.frame.blit(img, rect.topleft)
+            self.mark(rect)
+
+    def on_restart(self, kolam):
+        if self.frame.get_size() != (kolam.width, kolam.height):
+            return  # the writer is bound to one canvas size
+
+        self.flush()  # the run being dropped still gets its last frame
+        self.frame.fill(Colors.BLACK)
+        for idx in range(kolam.dim_x * kolam.dim_y):
+            for rect, _, _ in self.cell_rects(kolam, idx):
+                pygame.draw.rect(self.frame, Colors.MEDIUM_GRAY, rect, 1)
+        self.mark(self.frame.get_rect())
+
+    def on_collapse(self, kolam, idx):
+        self.draw_cell(kolam, idx)
+        self.pending += 1
+        if self.pending >= self.collapses_per_frame:
+            self.flush()
+
+    def flush(self):
+        rect = None if self.dirty is None else self.dirty.clip(self.frame.get_rect())
+        if rect:  # an empty Rect is falsy
+            self.writer.write(self.frame, rect)
+            self.frames += 1
+        self.dirty = None
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()